@@ -1,11 +1,15 @@
 import sys
 import os
+import json
 import pandas as pd
 import pytest
+import requests
+from diskcache import Cache
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from data_fetch import load_noise_data, merge_by_time
+import data_fetch
+from data_fetch import load_noise_data, merge_by_time, get_weather
 
 @pytest.fixture
 def sample_noise_csv(tmp_path):
@@ -47,8 +51,146 @@ def test_merge_by_time(sample_flights_df, sample_noise_csv):
     assert df_merged.iloc[0]["flight_number"] == "AB123"
     assert df_merged.iloc[1]["flight_number"] == "CD456"
 
+class _FakeResponse:
+    def __init__(self, payload, status_code=200, headers=None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(payload).encode()
 
+    def raise_for_status(self):
+        pass
 
+@pytest.fixture
+def weather_cache(tmp_path, monkeypatch):
+    cache = Cache(str(tmp_path / "weather"))
+    monkeypatch.setattr(data_fetch, "_weather_cache", cache)
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def http_cache(tmp_path, monkeypatch):
+    cache = Cache(str(tmp_path / "http"))
+    monkeypatch.setattr(data_fetch, "_http_cache", cache)
+    yield cache
+    cache.close()
+
+def test_get_weather_is_cached(weather_cache, http_cache, monkeypatch):
+    calls = []
+    payload = {"main": {"temp": 21.5}, "wind": {"speed": 3.2}, "weather": [{"description": "clear sky"}]}
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        return _FakeResponse(payload)
+
+    monkeypatch.setattr(data_fetch.SESSION, "get", fake_get)
+    first = get_weather(52.3667, 13.5033, "key-1")
+    second = get_weather(52.36671, 13.50329, "key-2")
+    assert first == second
+    assert first["Conditions"] == "Clear sky"
+    assert len(calls) == 1
+
+def test_get_weather_falls_back_to_stale_entry(weather_cache, http_cache, monkeypatch):
+    stale = {"Temperature (°C)": 18.0, "Wind Speed (m/s)": 1.0, "Conditions": "Fog"}
+    weather_cache.set(("weather", 52.367, 13.503), {"fetched_at": 0, "weather": stale})
+
+    def failing_get(url, **kwargs):
+        raise requests.exceptions.ConnectionError("offline")
+
+    monkeypatch.setattr(data_fetch.SESSION, "get", failing_get)
+    assert get_weather(52.3667, 13.5033, "key") == stale
+    with pytest.raises(RuntimeError, match="Failed to fetch weather"):
+        get_weather(49.0097, 2.5479, "key")
+
+def test_load_noise_data_parses_offsets(tmp_path):
+    file = tmp_path / "noise_tz.csv"
+    file.write_text("timestamp,noise_db\n2025-07-17T12:00:00+02:00,50\n2025-07-17T12:05:00+02:00,55\n")
+    df = load_noise_data(str(file))
+    assert str(df["timestamp"].dt.tz) == "UTC"
+    assert df["timestamp"].dt.unit == "ns"
+    assert df.iloc[0]["timestamp"] == pd.Timestamp("2025-07-17 10:00:00", tz="UTC")
+
+def test_load_noise_data_chunks(tmp_path):
+    rows = "".join(f"2025-07-17 10:{m:02d}:00,{50 + m}\n" for m in range(10))
+    file = tmp_path / "noise_chunks.csv"
+    file.write_text("timestamp,noise_db\n" + rows)
+    chunks = list(load_noise_data(str(file), chunksize=4))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert all(pd.api.types.is_datetime64_any_dtype(c["timestamp"]) for c in chunks)
+    assert len(load_noise_data(str(file), nrows=3)) == 3
+    with pytest.raises(RuntimeError, match="Unsupported file type"):
+        list(load_noise_data(str(tmp_path / "file.txt"), chunksize=4))
+
+def test_merge_by_time_presorted(sample_flights_df, sample_noise_csv):
+    df_noise = load_noise_data(sample_noise_csv)
+    expected = merge_by_time(df_noise, sample_flights_df, tolerance="2min")
+    presorted = merge_by_time(df_noise, sample_flights_df, tolerance="2min", presorted=True)
+    pd.testing.assert_frame_equal(presorted, expected)
+
+def test_merge_by_time_matches_within_airport():
+    df_noise = pd.DataFrame({
+        "timestamp": pd.to_datetime(["2025-07-17 10:00:00", "2025-07-17 10:00:00"], utc=True),
+        "icao": ["EDDB", "LFPG"],
+        "noise_db": [60, 70],
+    })
+    df_flights = pd.DataFrame({
+        "arrival_scheduled_utc": pd.to_datetime(["2025-07-17 10:01:00", "2025-07-17 10:04:00", "2025-07-17 12:00:00"], utc=True),
+        "icao": ["EDDB", "LFPG", "LFPG"],
+        "flight_number": ["AB123", "CD456", "EF789"],
+    })
+    df_merged = merge_by_time(df_noise, df_flights)
+    assert list(df_merged["icao"]) == ["EDDB", "LFPG"]
+    assert list(df_merged["flight_number"]) == ["AB123", "CD456"]
+
+def test_merge_by_time_mixed_units(sample_flights_df, sample_noise_csv):
+    df_noise = load_noise_data(sample_noise_csv)
+    df_noise["timestamp"] = df_noise["timestamp"].dt.as_unit("s")
+    df_merged = merge_by_time(df_noise, sample_flights_df, tolerance="2min")
+    assert list(df_merged["flight_number"]) == ["AB123", "CD456"]
+
+def test_merge_by_time_leaves_inputs_untouched(sample_flights_df, sample_noise_csv):
+    # Naive noise timestamps make merge_by_time convert the aware flight times
+    df_noise = load_noise_data(sample_noise_csv)
+    before = sample_flights_df.copy()
+    merge_by_time(df_noise, sample_flights_df, tolerance="2min")
+    pd.testing.assert_frame_equal(sample_flights_df, before)
+
+def test_load_noise_data_offsets_parse_to_utc_on_every_path(tmp_path):
+    file = tmp_path / "noise.csv"
+    file.write_text("timestamp,noise_db\n2025-03-30T01:00:00+01:00,50\n2025-03-30T04:00:00+02:00,55\n")
+    frames = [
+        load_noise_data(str(file)),
+        load_noise_data(str(file), nrows=2),
+        next(load_noise_data(str(file), chunksize=2)),
+    ]
+    expected = pd.to_datetime(["2025-03-30 00:00:00", "2025-03-30 02:00:00"], utc=True)
+    for df in frames:
+        assert str(df["timestamp"].dtype) == "datetime64[ns, UTC]"
+        assert list(df["timestamp"]) == list(expected)
+
+def test_load_noise_data_xlsx(tmp_path):
+    file = tmp_path / "noise.xlsx"
+    pd.DataFrame({"timestamp": ["2025-07-17 10:00:00", "2025-07-17 10:05:00"], "noise_db": [50, 55]}).to_excel(file, index=False)
+    df = load_noise_data(str(file))
+    assert pd.api.types.is_datetime64_any_dtype(df["timestamp"])
+    chunks = list(load_noise_data(str(file), chunksize=1))
+    assert [len(c) for c in chunks] == [1, 1]
+    assert list(df["noise_db"]) == [50, 55]
 
+def test_get_json_revalidates_with_etag(http_cache, monkeypatch):
+    sent_headers = []
+    responses = [
+        _FakeResponse({"arrivals": [1, 2]}, headers={"ETag": '"v1"'}),
+        _FakeResponse(None, status_code=304),
+    ]
 
+    def fake_get(url, params=None, headers=None, timeout=None):
+        sent_headers.append(headers)
+        return responses.pop(0)
 
+    monkeypatch.setattr(data_fetch.SESSION, "get", fake_get)
+    first = data_fetch.get_json("https://example.com/arrivals", ("arrivals", "EDDB"))
+    second = data_fetch.get_json("https://example.com/arrivals", ("arrivals", "EDDB"))
+    assert first == second == {"arrivals": [1, 2]}
+    assert "If-None-Match" not in sent_headers[0]
+    assert sent_headers[1]["If-None-Match"] == '"v1"'
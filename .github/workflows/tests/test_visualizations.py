@@ -0,0 +1,70 @@
+import sys
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import visualizations
+
+# Call the cached functions directly, without a Streamlit runtime
+_compute_hourly = visualizations._compute_hourly.__wrapped__
+_make_deck = visualizations._make_deck.__wrapped__
+
+def _old_compute_hourly(df_noise, df_arrivals, icao_codes):
+    # Reference: the isin + floor + outer merge version _compute_hourly replaced
+    df_noise_sel = df_noise[df_noise['icao'].isin(icao_codes)].copy()
+    df_arrivals_sel = df_arrivals[df_arrivals['icao'].isin(icao_codes)].copy()
+    df_noise_sel['hour'] = df_noise_sel['timestamp'].dt.floor('h')
+    noise_avg = df_noise_sel.groupby(['icao', 'hour'])['noise_db'].mean().reset_index()
+    df_arrivals_sel['hour'] = df_arrivals_sel['arrival_scheduled_utc'].dt.floor('h')
+    arrivals_count = df_arrivals_sel.groupby(['icao', 'hour']).size().reset_index(name='arrivals_count')
+    return pd.merge(noise_avg, arrivals_count, on=['icao', 'hour'], how='outer').fillna(0)
+
+@pytest.fixture
+def hourly_frames():
+    df_noise = pd.DataFrame({
+        "timestamp": pd.to_datetime([
+            "2025-07-17 10:05", "2025-07-17 10:40", "2025-07-17 11:10",
+            "2025-07-17 10:20", "2025-07-17 13:00",
+        ], utc=True),
+        "noise_db": [50.0, 60.0, 70.0, 40.0, 99.0],
+        "icao": ["EDDB", "EDDB", "EDDB", "EDDF", "EGLL"],
+    })
+    df_arrivals = pd.DataFrame({
+        "arrival_scheduled_utc": pd.to_datetime([
+            "2025-07-17 10:15", "2025-07-17 12:30", None,
+            "2025-07-17 10:50", "2025-07-17 12:05",
+        ], utc=True),
+        "icao": ["EDDB", "EDDB", "EDDB", "EDDF", "EGLL"],
+    })
+    return df_noise, df_arrivals
+
+def test_compute_hourly_matches_old_merge(hourly_frames):
+    df_noise, df_arrivals = hourly_frames
+    icao_codes = ("EDDF", "EDDB")
+    result = _compute_hourly(df_noise, df_arrivals, icao_codes)
+    expected = _old_compute_hourly(df_noise, df_arrivals, icao_codes)
+
+    # icao comes back categorical in selection order; compare values as plain strings
+    result = result.assign(icao=result['icao'].astype(object))
+    result = result.sort_values(['icao', 'hour'], ignore_index=True)
+    expected = expected.sort_values(['icao', 'hour'], ignore_index=True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    # The unselected airport and the NaT arrival are both dropped
+    assert "EGLL" not in set(result['icao'])
+    assert result['arrivals_count'].sum() == 3
+
+def test_make_deck_switches_to_hexagons_above_budget(monkeypatch):
+    monkeypatch.setattr(visualizations, "MAP_POINT_BUDGET", 3)
+    airports = [{"name": "EDDB - Berlin", "coordinates": [13.5, 52.4]}]
+
+    def flight_layer(n_points):
+        positions = np.tile([13.4, 52.5], (n_points, 1)).astype(np.float64)
+        deck = _make_deck(positions.tobytes(), airports)
+        return json.loads(deck.to_json())["layers"][0]["@@type"]
+
+    assert flight_layer(3) == "ScatterplotLayer"
+    assert flight_layer(4) == "HexagonLayer"
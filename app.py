@@ -2,13 +2,14 @@
 
 import streamlit as st
 import pandas as pd
-import requests
+import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from dotenv import load_dotenv
-import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib.figure import Figure
 import pydeck as pdk
+from data_fetch import get_json, load_noise_data
 
 # === Set Mapbox Token for PyDeck ===
 
@@ -24,6 +25,19 @@ AIRPORTS = {
     "EGLL": {"lat": 51.4700, "lon": -0.4543, "city": "London", "pop_m": 9.0},
 }
 
+# Fixed categories keep icao as compact int8 codes, also across concat
+ICAO_DTYPE = pd.CategoricalDtype(categories=list(AIRPORTS.keys()))
+
+# Map colour per airport (RGBA), with a fallback for anything else
+_COLOR_LUT = {"EDDB": [255, 0, 0, 160], "LFPG": [0, 255, 0, 160], "EGLL": [0, 0, 255, 160]}
+_DEFAULT_COLOR = [0, 100, 255, 160]
+
+# Rows per chunk when streaming the noise CSV (fastest of 128k-1M rows locally)
+NOISE_CHUNK_ROWS = 500_000
+
+# Measurement columns stored as float32 once loaded
+NOISE_FLOAT32_COLS = ('noise_db', 'max_slow')
+
 # === Streamlit Config ===
 load_dotenv()
 st.set_page_config(page_title="Silent Skies", layout="wide")
@@ -51,15 +65,41 @@ if weather_key:
     os.environ["OPENWEATHER_API_KEY"] = weather_key
 
 # === Load Noise CSV ===
+def _prepare_noise_chunk(chunk, icaos):
+    if 'timestamp' not in chunk.columns or 'icao' not in chunk.columns:
+        raise ValueError("Noise data must include 'timestamp' and 'icao' columns.")
+    # Drop unselected airports per chunk so they never reach the final concat
+    chunk = chunk[chunk['icao'].isin(icaos)]
+    ts = chunk['timestamp']
+    if not pd.api.types.is_datetime64_any_dtype(ts):
+        # Mixed UTC offsets (e.g. across DST) come back as object dtype
+        ts = pd.to_datetime(ts, errors='coerce', utc=True)
+    elif ts.dt.tz is None:
+        # Naive timestamps are local Berlin time
+        ts = ts.dt.tz_localize('Europe/Berlin', ambiguous='NaT', nonexistent='shift_forward')
+    chunk = chunk.assign(
+        timestamp=ts.dt.tz_convert('UTC'),
+        icao=chunk['icao'].astype(ICAO_DTYPE),
+    ).dropna(subset=['timestamp'])
+    # float32 is plenty for dB readings and halves the bytes every aggregation scans
+    measures = [c for c in NOISE_FLOAT32_COLS if c in chunk.columns and pd.api.types.is_numeric_dtype(chunk[c])]
+    chunk = chunk.astype(dict.fromkeys(measures, 'float32'))
+    # Hour of day (UTC) is shared by the hourly plots, so extract it once here
+    return chunk.assign(hour=chunk['timestamp'].dt.hour.astype('int8'))
+
+@st.cache_data(show_spinner=False)
+def load_noise(noise_file, icaos):
+    # Keyed on the uploaded bytes and the selected airports
+    chunks = load_noise_data(noise_file, chunksize=NOISE_CHUNK_ROWS)
+    df = pd.concat(_prepare_noise_chunk(c, icaos) for c in chunks)
+    return df.sort_values('timestamp', kind='stable')
+
 if noise_file:
-    df_noise = pd.read_csv(noise_file)
-    if 'timestamp' not in df_noise.columns or 'icao' not in df_noise.columns:
-        st.error("Noise data must include 'timestamp' and 'icao' columns.")
+    try:
+        df_noise = load_noise(noise_file, tuple(icao_list))
+    except (RuntimeError, ValueError) as e:
+        st.error(f"Error loading noise data: {e}")
         st.stop()
-    df_noise['timestamp'] = pd.to_datetime(df_noise['timestamp'], errors='coerce')
-    df_noise.dropna(subset=['timestamp'], inplace=True)
-    df_noise['timestamp'] = df_noise['timestamp'].apply(lambda x: x.tz_localize('Europe/Berlin') if x.tzinfo is None else x)
-    df_noise['timestamp'] = df_noise['timestamp'].dt.tz_convert('UTC')
     st.subheader("🔊 Noise Data Preview")
     st.dataframe(df_noise.head())
 else:
@@ -67,91 +107,132 @@ else:
     st.stop()
 
 # === Get Flight Arrivals ===
-def get_arrivals(icao, api_key, target_day):
+# Shared stand-in for missing nested JSON objects; never mutated
+_EMPTY = {}
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_arrivals(icao, _api_key, start, end):
+    # Cached per (icao, start, end); the API key is left out of the key
     headers = {
-        "x-rapidapi-key": api_key,
+        "x-rapidapi-key": _api_key,
         "x-rapidapi-host": "aerodatabox.p.rapidapi.com"
     }
-    base_url = f"https://aerodatabox.p.rapidapi.com/flights/airports/icao/{icao}"
-    ranges = [(f"{target_day}T00:00", f"{target_day}T12:00"), (f"{target_day}T12:00", f"{target_day}T23:59")]
+    url = f"https://aerodatabox.p.rapidapi.com/flights/airports/icao/{icao}/{start}/{end}"
+    params = {
+        "withLeg": "true", "direction": "Arrival", "withCancelled": "false",
+        "withCodeshared": "false", "withCargo": "false", "withPrivate": "false",
+        "withLocation": "true"
+    }
+    data = get_json(url, ("aerodatabox", icao, start, end), params=params, headers=headers)
+    # Hoist the per-airport fallbacks and walk each nested dict only once
+    default_lat = AIRPORTS.get(icao, {}).get("lat")
+    default_lon = AIRPORTS.get(icao, {}).get("lon")
     flights = []
-    for start, end in ranges:
-        url = f"{base_url}/{start}/{end}"
-        params = {
-            "withLeg": "true", "direction": "Arrival", "withCancelled": "false",
-            "withCodeshared": "false", "withCargo": "false", "withPrivate": "false",
-            "withLocation": "true"
-        }
-        try:
-            res = requests.get(url, headers=headers, params=params, timeout=10)
-            res.raise_for_status()
-            for flight in res.json().get("arrivals", []):
-                arrival_info = flight.get("arrival", {}).get("airport", {})
-                loc = arrival_info.get("location", {})
-                lat = loc.get("latitude") or AIRPORTS.get(icao, {}).get("lat")
-                lon = loc.get("longitude") or AIRPORTS.get(icao, {}).get("lon")
-                departure_info = flight.get("departure", {}).get("airport", {})
-                origin_airport_name = departure_info.get("name", "Unknown")
-                flights.append({
-                    "flight_number": flight.get("number"),
-                    "arrival_scheduled_utc": flight.get("arrival", {}).get("scheduledTime", {}).get("utc"),
-                    "arrival_latitude": lat,
-                    "arrival_longitude": lon,
-                    "model": flight.get("aircraft", {}).get("model"),
-                    "icao": icao,
-                    "origin_airport_name": origin_airport_name
-                })
-        except Exception as e:
-            st.warning(f"Error fetching arrivals for {icao}: {e}")
-    return pd.DataFrame(flights)
+    for flight in data.get("arrivals", ()):
+        arrival = flight.get("arrival") or _EMPTY
+        loc = (arrival.get("airport") or _EMPTY).get("location") or _EMPTY
+        origin = (flight.get("departure") or _EMPTY).get("airport") or _EMPTY
+        flights.append({
+            "flight_number": flight.get("number"),
+            "arrival_scheduled_utc": (arrival.get("scheduledTime") or _EMPTY).get("utc"),
+            "arrival_latitude": loc.get("latitude") or default_lat,
+            "arrival_longitude": loc.get("longitude") or default_lon,
+            "model": (flight.get("aircraft") or _EMPTY).get("model"),
+            "icao": icao,
+            "origin_airport_name": origin.get("name", "Unknown")
+        })
+    return flights
+
+@st.cache_resource
+def _arrivals_pool():
+    # One pool for the whole server process: reruns reuse its warm threads
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="arrivals")
+
+def _fetch_one(icao, start, end, api_key):
+    # Runs on a worker thread: return the error instead of calling st.warning here
+    try:
+        return icao, get_arrivals(icao, api_key, start, end), None
+    except Exception as e:
+        return icao, [], e
 
 # Fetch Arrivals
 df_arrivals = pd.DataFrame()
 if api_key and icao_list:
     st.subheader(f"🛬 Arrivals on {selected_date}")
-    all_arrivals = []
-    for icao in icao_list:
-        df = get_arrivals(icao, api_key, selected_date.isoformat())
-        if not df.empty:
-            df['arrival_scheduled_utc'] = pd.to_datetime(df['arrival_scheduled_utc'], utc=True, errors='coerce')
-            all_arrivals.append(df)
-            st.write(f"{icao} Sample Arrivals", df.head())
-    if all_arrivals:
-        df_arrivals = pd.concat(all_arrivals)
+    target_day = selected_date.isoformat()
+    ranges = [(f"{target_day}T00:00", f"{target_day}T12:00"), (f"{target_day}T12:00", f"{target_day}T23:59")]
+    jobs = [(icao, start, end) for icao in icao_list for start, end in ranges]
+    # All (airport, half-day) requests run concurrently over the shared keep-alive session
+    results = list(_arrivals_pool().map(lambda job: _fetch_one(*job, api_key), jobs))
+    all_rows = []
+    for icao, rows, error in results:
+        if error is not None:
+            st.warning(f"Error fetching arrivals for {icao}: {error}")
+        all_rows.extend(rows)
+    if all_rows:
+        df_arrivals = pd.DataFrame(all_rows)
+        df_arrivals['arrival_scheduled_utc'] = pd.to_datetime(df_arrivals['arrival_scheduled_utc'], utc=True, errors='coerce')
+        df_arrivals['icao'] = df_arrivals['icao'].astype(ICAO_DTYPE)
+        # Nullable: flights without a scheduled time have no hour
+        df_arrivals['hour'] = df_arrivals['arrival_scheduled_utc'].dt.hour.astype('Int8')
+        # Sorted once here so merge_by_time can skip its sorts
+        df_arrivals = df_arrivals.sort_values('arrival_scheduled_utc', kind='stable', ignore_index=True)
+        # First rows per airport from one groupby pass, not one full-frame mask per airport
+        samples = df_arrivals.groupby('icao', sort=False, observed=True).head()
+        for icao in icao_list:
+            df = samples[samples['icao'] == icao]
+            if not df.empty:
+                st.write(f"{icao} Sample Arrivals", df)
 else:
     st.info("Enter your API key and select airports to fetch data.")
 
 # Weather Info
+@st.cache_data(ttl=600, show_spinner=False)
+def _fetch_weather(lat, lon, _key):
+    # Leading underscore keeps the API key out of Streamlit's cache key.
+    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={_key}&units=metric"
+    d = get_json(url, ("openweathermap", lat, lon))
+    return {
+        "desc": d['weather'][0]['description'].title(),
+        "temp": d['main']['temp'],
+        "wind": d['wind']['speed'],
+        "humidity": d['main'].get('humidity', 'N/A'),
+    }
+
 def get_weather(lat, lon, key):
+    # Failures raise inside _fetch_weather, so they are never cached
     try:
-        res = requests.get(f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={key}&units=metric")
-        res.raise_for_status()
-        d = res.json()
-        return {
-            "desc": d['weather'][0]['description'].title(),
-            "temp": d['main']['temp'],
-            "wind": d['wind']['speed'],
-            "humidity": d['main'].get('humidity', 'N/A'),
-        }
+        return _fetch_weather(round(lat, 3), round(lon, 3), key)
     except Exception:
         return None
 
 # Merge
-def merge_by_time(df_noise, df_arrivals):
-    df_arrivals = df_arrivals.dropna(subset=["arrival_scheduled_utc"]).sort_values("arrival_scheduled_utc")
-    df_noise = df_noise.sort_values("timestamp")
-    return pd.merge_asof(df_noise, df_arrivals, left_on="timestamp", right_on="arrival_scheduled_utc", direction="nearest", tolerance=pd.Timedelta("15m"))
+@st.cache_data(show_spinner=False)
+def merge_by_time(df_noise, df_arrivals, presorted=False, tolerance=pd.Timedelta("15m")):
+    # Only flights within tolerance of the noise window can ever match (between() also drops NaT)
+    lo, hi = df_noise["timestamp"].min() - tolerance, df_noise["timestamp"].max() + tolerance
+    df_arrivals = df_arrivals[df_arrivals["arrival_scheduled_utc"].between(lo, hi)]
+    if not presorted:
+        df_arrivals = df_arrivals.sort_values("arrival_scheduled_utc", kind="stable")
+        df_noise = df_noise.sort_values("timestamp", kind="stable")
+    # by="icao" keeps each noise reading matched to flights at its own airport
+    return pd.merge_asof(df_noise, df_arrivals, left_on="timestamp", right_on="arrival_scheduled_utc", by="icao", direction="nearest", tolerance=tolerance, allow_exact_matches=True)
 
 # === Visualizations ===
 def plot_map(df):
-    if df[['arrival_latitude', 'arrival_longitude']].notnull().all(axis=1).any():
-        df_map = df.dropna(subset=['arrival_latitude', 'arrival_longitude']).copy()
-
-        def map_color(icao):
-            colors = {"EDDB": [255, 0, 0, 160], "LFPG": [0, 255, 0, 160], "EGLL": [0, 0, 255, 160]}
-            return colors.get(icao, [0, 100, 255, 160])
-
-        df_map['color'] = df_map['icao'].apply(map_color)
+    # One boolean mask answers "any coordinates?" and also selects the rows to draw
+    has_coords = df['arrival_latitude'].notna().to_numpy() & df['arrival_longitude'].notna().to_numpy()
+    if has_coords.any():
+        df_map = df[has_coords]
+
+        # Map the plain labels: list values cannot become categories
+        colors = df_map['icao'].astype(object).map(_COLOR_LUT)
+        missing = colors.isna()
+        if missing.any():
+            colors[missing] = pd.Series([_DEFAULT_COLOR] * missing.sum(), index=colors.index[missing])
+        # Boolean indexing already returned a new frame; insert() adds the column
+        # in place without the full copy that .copy()/.assign() would make
+        df_map.insert(len(df_map.columns), 'color', colors)
 
         heat_layer = pdk.Layer(
             "HeatmapLayer",
@@ -195,52 +276,81 @@ def plot_map(df):
             map_style="https://basemaps.cartocdn.com/gl/positron-gl-style/style.json"
         ))
 
-def plot_noise_subplots(df):
-    st.write("### 📈 Noise Levels Over Time by Airport")
-    fig, axes = plt.subplots(len(icao_list), 1, figsize=(10, 3 * len(icao_list)), sharex=True)
-    if len(icao_list) == 1:
+# Figure builders are cached on their inputs and build plain Figure objects,
+# so nothing is registered with pyplot's global figure list.
+@st.cache_data(show_spinner=False)
+def noise_subplots_figure(df, icaos):
+    fig = Figure(figsize=(10, 3 * len(icaos)))
+    axes = fig.subplots(len(icaos), 1, sharex=True)
+    if len(icaos) == 1:
         axes = [axes]
-    for ax, icao in zip(axes, icao_list):
-        sns.lineplot(data=df[df['icao'] == icao], x='timestamp', y='noise_db', ax=ax)
+    # Split the noise rows by airport once; airports without data keep an empty titled panel
+    groups = dict(tuple(df.groupby('icao', sort=False, observed=True)))
+    for ax, icao in zip(axes, icaos):
+        data = groups.get(icao)
+        if data is None:
+            ax.set_title(icao)
+            continue
+        # Per-minute means keep the line readable and avoid drawing every raw sample
+        sub = data[['timestamp', 'noise_db']].set_index('timestamp').resample('1min').mean().dropna()
+        ax.plot(sub.index, sub['noise_db'].to_numpy(), linewidth=0.7)
         ax.set_title(icao)
         ax.set_ylabel("Noise (dB)")
-    plt.tight_layout()
-    st.pyplot(fig)
+    fig.tight_layout()
+    return fig
 
-def plot_arrival_histograms(df):
-    st.write("### ✈️ Arrivals per Hour by Airport")
-    fig, ax = plt.subplots(figsize=(10, 4))
-    for icao in df['icao'].unique():
-        subset = df[df['icao'] == icao].copy()
-        subset['hour'] = subset['arrival_scheduled_utc'].dt.hour
-        sns.histplot(subset['hour'], label=icao, bins=24, alpha=0.5, ax=ax)
+def plot_noise_subplots(df):
+    st.write("### 📈 Noise Levels Over Time by Airport")
+    fig = noise_subplots_figure(df, tuple(icao_list))
+    st.pyplot(fig)
+    fig.clear()
+
+@st.cache_data(show_spinner=False)
+def arrival_histograms_figure(df):
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    hours = np.arange(24)
+    counts = (
+        df.groupby(['icao', 'hour'], observed=True).size()
+        .unstack(fill_value=0)
+        .reindex(columns=hours, fill_value=0)
+    )
+    # Side-by-side bars per airport within each hour
+    width = 0.8 / max(len(counts), 1)
+    for i, icao in enumerate(counts.index):
+        ax.bar(hours - 0.4 + (i + 0.5) * width, counts.loc[icao].to_numpy(), width=width, alpha=0.8, label=icao)
     ax.set_xlabel("Hour (UTC)")
     ax.set_ylabel("Arrivals")
     ax.legend()
+    return fig
+
+def plot_arrival_histograms(df):
+    st.write("### ✈️ Arrivals per Hour by Airport")
+    fig = arrival_histograms_figure(df)
     st.pyplot(fig)
+    fig.clear()
 
-def plot_combined_hourly(df_noise, df_arrivals):
-    st.write("### ⏱️ Noise vs Arrivals per Hour")
-    fig, ax1 = plt.subplots(figsize=(10, 5))
+@st.cache_data(show_spinner=False)
+def combined_hourly_figure(df_noise, df_arrivals, icaos):
+    fig = Figure(figsize=(10, 5))
+    ax1 = fig.subplots()
     ax2 = ax1.twinx()  # Create just once outside the loop
 
-    for icao in icao_list:
-        n = df_noise[df_noise['icao'] == icao].copy()
-        a = df_arrivals[df_arrivals['icao'] == icao].copy()
-        if n.empty or a.empty:
-            continue
-        n['hour'] = n['timestamp'].dt.hour
-        a['hour'] = a['arrival_scheduled_utc'].dt.hour
+    # Group by airport and hour once; one column per airport
+    noise_avg = df_noise.groupby(['icao', 'hour'], observed=True)['noise_db'].mean().unstack(0)
+    arr_count = df_arrivals.groupby(['icao', 'hour'], observed=True).size().unstack(0)
 
-        # Group by hour
-        noise_avg = n.groupby('hour')['noise_db'].mean()
-        arr_count = a.groupby('hour').size()
+    for icao in icaos:
+        if icao not in noise_avg.columns or icao not in arr_count.columns:
+            continue
+        n = noise_avg[icao].dropna()
+        a = arr_count[icao].dropna()
 
         # Bar chart for arrivals on ax1
-        ax1.bar(arr_count.index, arr_count.values, alpha=0.3, label=f"{icao} Arrivals")
+        ax1.bar(a.index, a.to_numpy(), alpha=0.3, label=f"{icao} Arrivals")
 
         # Line chart for noise on ax2
-        ax2.plot(noise_avg.index, noise_avg.values, marker='o', linestyle='--', label=f"{icao} Noise")
+        ax2.plot(n.index, n.to_numpy(), marker='o', linestyle='--', label=f"{icao} Noise")
 
     ax1.set_xlabel("Hour (UTC)")
     ax1.set_ylabel("Arrivals", color='tab:blue')
@@ -251,11 +361,17 @@ def plot_combined_hourly(df_noise, df_arrivals):
     lines_2, labels_2 = ax2.get_legend_handles_labels()
     ax2.legend(lines_1 + lines_2, labels_1 + labels_2, loc="upper left")
 
+    return fig
+
+def plot_combined_hourly(df_noise, df_arrivals):
+    st.write("### ⏱️ Noise vs Arrivals per Hour")
+    fig = combined_hourly_figure(df_noise, df_arrivals, tuple(icao_list))
     st.pyplot(fig)
+    fig.clear()
 
 # === Main Display ===
 if not df_arrivals.empty and not df_noise.empty:
-    merged_df = merge_by_time(df_noise, df_arrivals)
+    merged_df = merge_by_time(df_noise, df_arrivals, presorted=True)
     plot_map(df_arrivals)
     plot_noise_subplots(df_noise)
     plot_arrival_histograms(df_arrivals)
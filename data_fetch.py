@@ -1,50 +1,188 @@
+import time
+import warnings
+
 import pandas as pd
 import requests
+from diskcache import Cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # orjson decodes the nested AeroDataBox payloads several times faster
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+try:
+    from python_calamine import CalamineError as _CalamineError
+except ImportError:
+    # pandas raises ImportError for engine="calamine" in that case
+    _CalamineError = ImportError
+
+# Weather responses are cached on disk per (rounded) location so repeated
+# reruns skip the OpenWeatherMap round-trip. Entries older than
+# WEATHER_TTL are refreshed, but kept around as a fallback if the API fails.
+WEATHER_TTL = 600
+WEATHER_STALE_TTL = 24 * 3600
+_weather_cache = Cache("./.weather_cache")
+
+def create_session():
+    """Return a requests session with pooled keep-alive connections and retry/backoff on transient errors."""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retries))
+    return session
+
+# Shared by every API call; lives as long as the module, i.e. across Streamlit reruns
+SESSION = create_session()
+
+# Last validators and body per resource, for conditional requests
+HTTP_CACHE_TTL = 3600
+_http_cache = Cache("./.http_cache")
+
+def get_json(url, cache_key, params=None, headers=None):
+    """GET a JSON payload, revalidating any cached copy with ETag/Last-Modified.
+
+    ``cache_key`` identifies the resource and must not contain API keys. When the
+    server answers 304 Not Modified the cached body is returned instead.
+    """
+    headers = dict(headers or {})
+    entry = _http_cache.get(cache_key)
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
 
-def load_noise_data(uploaded_file):
-    """Load noise data from CSV or XLSX and parse 'timestamp' column if present."""
+    response = SESSION.get(url, params=params, headers=headers, timeout=10)
+    if response.status_code == 304 and entry is not None:
+        return entry["json"]
+    response.raise_for_status()
+    data = _json_loads(response.content)
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        _http_cache.set(
+            cache_key,
+            {"etag": etag, "last_modified": last_modified, "json": data},
+            expire=HTTP_CACHE_TTL,
+        )
+    return data
+
+def _noise_file_type(uploaded_file):
+    """Return '.csv' or '.xlsx' for a local path or Streamlit upload."""
+    name = uploaded_file if isinstance(uploaded_file, str) else uploaded_file.name
+    for ext in (".csv", ".xlsx"):
+        if name.endswith(ext):
+            return ext
+    raise ValueError("Unsupported file type")
+
+def _parse_timestamp(df):
+    """Parse the 'timestamp' column in place if present."""
+    if "timestamp" in df.columns:
+        ts = df["timestamp"]
+        if pd.api.types.is_datetime64_any_dtype(ts):
+            # pyarrow already parsed ISO 8601 timestamps; only match pandas' ns unit
+            ts = ts.dt.as_unit("ns")
+        else:
+            with warnings.catch_warnings():
+                # Mixed UTC offsets (e.g. across DST) are handled just below
+                warnings.simplefilter("ignore", FutureWarning)
+                parsed = pd.to_datetime(ts, errors="coerce")
+            if not pd.api.types.is_datetime64_any_dtype(parsed):
+                parsed = pd.to_datetime(ts, errors="coerce", utc=True)
+            ts = parsed
+        if isinstance(ts.dtype, pd.DatetimeTZDtype):
+            # Same zone on every read path, whatever offset the file used
+            ts = ts.dt.tz_convert("UTC")
+        df["timestamp"] = ts
+    return df
+
+def _read_excel(uploaded_file, nrows=None):
+    """Read an XLSX with the Rust calamine parser, falling back to openpyxl."""
     try:
-        if isinstance(uploaded_file, str):  # local path (for testing)
-            if uploaded_file.endswith(".csv"):
-                df = pd.read_csv(uploaded_file)
-            elif uploaded_file.endswith(".xlsx"):
-                df = pd.read_excel(uploaded_file)
-            else:
-                raise ValueError("Unsupported file type")
-        else:  # Streamlit uploaded file-like object
-            if uploaded_file.name.endswith(".csv"):
-                df = pd.read_csv(uploaded_file)
-            elif uploaded_file.name.endswith(".xlsx"):
-                df = pd.read_excel(uploaded_file)
-            else:
-                raise ValueError("Unsupported file type")
+        return pd.read_excel(uploaded_file, engine="calamine", nrows=nrows)
+    except (ImportError, _CalamineError):
+        # python-calamine missing or the workbook is one it cannot handle
+        if hasattr(uploaded_file, "seek"):
+            uploaded_file.seek(0)
+        return pd.read_excel(uploaded_file, nrows=nrows)
 
-        if "timestamp" in df.columns:
-            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-        return df
+def _iter_noise_chunks(uploaded_file, chunksize, nrows):
+    try:
+        if _noise_file_type(uploaded_file) == ".csv":
+            with pd.read_csv(uploaded_file, chunksize=chunksize, nrows=nrows) as reader:
+                for chunk in reader:
+                    yield _parse_timestamp(chunk)
+        else:
+            # Sheets cannot be streamed: read the whole one, then hand it out in
+            # slices (an empty sheet still yields one empty frame)
+            df = _parse_timestamp(_read_excel(uploaded_file, nrows=nrows))
+            for start in range(0, max(len(df), 1), chunksize):
+                yield df.iloc[start:start + chunksize]
+    except Exception as e:
+        raise RuntimeError(f"Failed to load file: {e}")
+
+def load_noise_data(uploaded_file, chunksize=None, nrows=None):
+    """Load noise data from CSV or XLSX and parse 'timestamp' column if present.
+
+    With ``chunksize`` set, returns an iterator of DataFrames of at most that many
+    rows instead. CSVs are streamed, so large files never have to fit in memory
+    at once; an XLSX sheet is read whole and then split into chunks. ``nrows``
+    limits how many rows are read, e.g. for a quick preview. Timestamps with
+    UTC offsets come back in UTC on every read path.
+    """
+    if chunksize is not None:
+        return _iter_noise_chunks(uploaded_file, chunksize, nrows)
+    try:
+        if _noise_file_type(uploaded_file) == ".csv":
+            if nrows is None:
+                df = pd.read_csv(uploaded_file, engine="pyarrow")
+            else:
+                # The pyarrow engine does not support nrows
+                df = pd.read_csv(uploaded_file, nrows=nrows)
+        else:
+            df = _read_excel(uploaded_file, nrows=nrows)
+        return _parse_timestamp(df)
 
     except Exception as e:
         raise RuntimeError(f"Failed to load file: {e}")
 
 def get_weather(lat, lon, api_key):
-    """Fetch current weather from OpenWeatherMap API."""
+    """Fetch current weather from OpenWeatherMap API, cached per location for WEATHER_TTL seconds."""
+    # The API key is deliberately left out of the cache key.
+    cache_key = ("weather", round(lat, 3), round(lon, 3))
+    cached = _weather_cache.get(cache_key)
+    if cached is not None and time.time() - cached["fetched_at"] < WEATHER_TTL:
+        return cached["weather"]
+
     try:
         url = (
             f"https://api.openweathermap.org/data/2.5/weather?"
             f"lat={lat}&lon={lon}&appid={api_key}&units=metric"
         )
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = get_json(url, ("openweathermap", round(lat, 3), round(lon, 3)))
 
-        return {
+        weather = {
             "Temperature (°C)": data["main"]["temp"],
             "Wind Speed (m/s)": data["wind"]["speed"],
             "Conditions": data["weather"][0]["description"].capitalize(),
         }
+    except requests.exceptions.RequestException as e:
+        if cached is not None:
+            return cached["weather"]
+        raise RuntimeError(f"Failed to fetch weather: {e}")
     except Exception as e:
         raise RuntimeError(f"Failed to fetch weather: {e}")
 
+    _weather_cache.set(
+        cache_key,
+        {"fetched_at": time.time(), "weather": weather},
+        expire=WEATHER_STALE_TTL,
+    )
+    return weather
+
 def enrich_with_weather(df, lat, lon, api_key):
     """Add weather details as columns to the DataFrame."""
     try:
@@ -55,42 +193,72 @@ def enrich_with_weather(df, lat, lon, api_key):
     except Exception as e:
         raise RuntimeError(f"Failed to enrich with weather: {e}")
 
+def _as_ns(df, col):
+    """Return ``df`` with datetime column ``col`` in nanoseconds, copying only if needed."""
+    if df[col].dt.unit != "ns":
+        df = df.assign(**{col: df[col].dt.as_unit("ns")})
+    return df
+
 def merge_by_time(
     df_noise,
     df_flights,
     time_col_noise="timestamp",
     time_col_flight="arrival_scheduled_utc",
     tolerance="5min",
+    presorted=False,
 ):
-    """Merge noise and flight data on nearest timestamps within a time tolerance."""
+    """Merge noise and flight data on nearest timestamps within a time tolerance.
+
+    Pass ``presorted=True`` when both frames are already sorted by their time
+    columns to skip the sorts.
+    """
     try:
         if time_col_noise not in df_noise.columns:
             raise ValueError(f"Missing column '{time_col_noise}' in noise data.")
         if time_col_flight not in df_flights.columns:
             raise ValueError(f"Missing column '{time_col_flight}' in flight data.")
 
-        # Ensure consistent timezone awareness for merging
+        # Ensure consistent timezone awareness for merging. assign() works on a
+        # new frame so the caller's df_flights is left untouched.
         if pd.api.types.is_datetime64tz_dtype(df_noise[time_col_noise]):
             # noise is timezone-aware
             if not pd.api.types.is_datetime64tz_dtype(df_flights[time_col_flight]):
                 # flights is naive — convert flights to UTC aware
-                df_flights[time_col_flight] = df_flights[time_col_flight].dt.tz_localize("UTC")
+                df_flights = df_flights.assign(**{time_col_flight: df_flights[time_col_flight].dt.tz_localize("UTC")})
         else:
             # noise is naive
             if pd.api.types.is_datetime64tz_dtype(df_flights[time_col_flight]):
                 # flights is aware — convert flights to naive (UTC)
-                df_flights[time_col_flight] = df_flights[time_col_flight].dt.tz_convert(None)
+                df_flights = df_flights.assign(**{time_col_flight: df_flights[time_col_flight].dt.tz_convert(None)})
+
+        # merge_asof compares the keys as raw int64 and refuses mixed units
+        # (e.g. datetime64[s] from pyarrow vs [ns]); align both on ns
+        df_noise = _as_ns(df_noise, time_col_noise)
+        df_flights = _as_ns(df_flights, time_col_flight)
+
+        # Only flights within tolerance of the noise window can ever match
+        tolerance = pd.Timedelta(tolerance)
+        lo = df_noise[time_col_noise].min() - tolerance
+        hi = df_noise[time_col_noise].max() + tolerance
+        df_flights = df_flights[df_flights[time_col_flight].between(lo, hi)]
+
+        # Match within each airport when both frames say which one they belong to
+        by = "icao" if "icao" in df_noise.columns and "icao" in df_flights.columns else None
 
-        df_noise_sorted = df_noise.sort_values(by=time_col_noise).copy()
-        df_flights_sorted = df_flights.sort_values(by=time_col_flight).copy()
+        # sort_values already returns new frames, no extra copy needed
+        if not presorted:
+            df_noise = df_noise.sort_values(by=time_col_noise, kind="stable")
+            df_flights = df_flights.sort_values(by=time_col_flight, kind="stable")
 
         df_merged = pd.merge_asof(
-            df_noise_sorted,
-            df_flights_sorted,
+            df_noise,
+            df_flights,
             left_on=time_col_noise,
             right_on=time_col_flight,
+            by=by,
             direction="nearest",
-            tolerance=pd.Timedelta(tolerance),
+            tolerance=tolerance,
+            allow_exact_matches=True,
         )
         return df_merged
     except Exception as e:
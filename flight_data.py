@@ -19,6 +19,8 @@ uploaded_file = st.file_uploader("Upload Noise Data CSV or XLSX", type=["csv", "
 
 if uploaded_file is not None:
     noise_df = None
+    if uploaded_file.name.endswith(".xlsx") and uploaded_file.size > 50 * 1024 * 1024:
+        st.warning("Large XLSX files load much slower than CSV. Consider exporting the sheet to CSV.")
     try:
         noise_df = load_noise_data(uploaded_file)
         st.success(f"Loaded noise data with {len(noise_df)} records.")
@@ -81,17 +83,18 @@ if uploaded_file is not None:
                     fig, ax = plt.subplots(figsize=(14, 7))
                     sns.set_style("whitegrid")
 
-                    # Histogram bars
-                    sns.barplot(
-                        data=avg_db_hourly,
-                        x='hour',
-                        y='dB',
-                        hue='airport',
-                        palette='Set2',
-                        ci=None,
-                        dodge=True,
-                        ax=ax
-                    )
+                    # Histogram bars, one group per hour and one bar per airport
+                    bars = avg_db_hourly.pivot(index='hour', columns='airport', values='dB')
+                    palette = sns.color_palette('Set2', len(bars.columns))
+                    width = 0.8 / len(bars.columns)
+                    for i, airport in enumerate(bars.columns):
+                        ax.bar(
+                            bars.index - 0.4 + (i + 0.5) * width,
+                            bars[airport].to_numpy(),
+                            width=width,
+                            color=palette[i],
+                            label=airport
+                        )
 
                     # Overlay trend lines
                     for airport in avg_db_hourly['airport'].unique():
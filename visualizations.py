@@ -3,42 +3,101 @@
 import streamlit as st
 import pydeck as pdk
 import pandas as pd
+import numpy as np
+import matplotlib
+# Figures are only rasterized for st.pyplot; skip any interactive GUI backend
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 import seaborn as sns
 
 sns.set_theme(style="whitegrid")
 
-def plot_map(df_arrivals: pd.DataFrame, icao_list: list, airports_info: dict) -> None:
+# Decimal places kept for map coordinates
+COORD_DECIMALS = 5
+
+# Bucket size the noise time series is averaged to before plotting
+NOISE_RESAMPLE_RULE = "1min"
+
+# Resolution figures are drawn and encoded at; st.pyplot defaults to 200
+PLOT_DPI = 72
+
+# Above this many flight points the map bins them with a HexagonLayer
+MAP_POINT_BUDGET = 20_000
+
+def _subplots(*args, **kwargs):
+    """plt.subplots at PLOT_DPI with constrained layout, shared by every plot."""
+    return plt.subplots(*args, dpi=PLOT_DPI, layout='constrained', **kwargs)
+
+def _render(fig) -> None:
+    """Show a figure in Streamlit at PLOT_DPI and release it."""
+    st.pyplot(fig, dpi=PLOT_DPI)
+    # pyplot keeps every figure alive until it is closed
+    plt.close(fig)
+
+def _datetime_values(values) -> np.ndarray:
     """
-    Render a PyDeck map with arrival airport locations and flight points.
+    Return datetimes as a plain datetime64 array (in UTC if tz-aware) for matplotlib.
+
+    tz-aware pandas data would otherwise become an object array of Timestamps.
+    """
+    values = pd.DatetimeIndex(values)
+    if values.tz is not None:
+        values = values.tz_convert('UTC').tz_localize(None)
+    return values.to_numpy()
+
+@st.cache_data(show_spinner=False)
+def _build_airport_points(icao_codes: tuple, airports_info: dict) -> list:
+    """
+    Build the airport marker records for the selected airports, cached across reruns.
 
     Args:
-        df_arrivals (pd.DataFrame): DataFrame containing arrival flights info.
-        icao_list (list): List of ICAO airport codes selected.
+        icao_codes (tuple): Selected ICAO airport codes.
         airports_info (dict): Dict with airport lat/lon/city info.
     """
-    if df_arrivals.empty:
-        st.warning("No arrivals data to plot on map.")
-        return
+    # Look each airport up once and read lon/lat/city from the same record
+    return [
+        {"name": f"{code} - {info['city']}", "coordinates": [info['lon'], info['lat']]}
+        for code in icao_codes
+        if (info := airports_info.get(code)) is not None
+    ]
 
-    # Create scatter points for flights on map
-    flight_points = df_arrivals.dropna(subset=['arrival_latitude', 'arrival_longitude'])
-    flight_layer = pdk.Layer(
-        "ScatterplotLayer",
-        data=flight_points,
-        get_position='[arrival_longitude, arrival_latitude]',
-        get_color='[200, 30, 0, 160]',
-        get_radius=1000,
-        pickable=True,
-        auto_highlight=True,
-    )
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _make_deck(flight_positions: bytes, airport_points: list) -> pdk.Deck:
+    """
+    Build the arrivals map, shared across reruns and sessions for identical inputs.
+
+    Args:
+        flight_positions (bytes): Flight [lon, lat] pairs as raw float64 bytes.
+        airport_points (list): Airport marker records from _build_airport_points.
+    """
+    positions = np.frombuffer(flight_positions, dtype=np.float64).reshape(-1, 2).tolist()
+    flight_data = [{"position": p} for p in positions]
+    if len(flight_data) > MAP_POINT_BUDGET:
+        # Past the budget overlapping dots are unreadable and slow to draw;
+        # aggregate them into flat hexagon bins instead
+        flight_layer = pdk.Layer(
+            "HexagonLayer",
+            data=flight_data,
+            get_position='position',
+            radius=5000,
+            elevation_scale=0,
+            extruded=False,
+            pickable=False,
+        )
+    else:
+        flight_layer = pdk.Layer(
+            "ScatterplotLayer",
+            data=flight_data,
+            get_position='position',
+            get_color='[200, 30, 0, 160]',
+            get_radius=1000,
+        )
 
     # Mark selected airports with bigger blue circles
-    airport_points = [
-        {"name": f"{code} - {airports_info[code]['city']}", 
-         "coordinates": [airports_info[code]['lon'], airports_info[code]['lat']]} 
-        for code in icao_list if code in airports_info
-    ]
     airport_layer = pdk.Layer(
         "ScatterplotLayer",
         data=airport_points,
@@ -60,22 +119,45 @@ def plot_map(df_arrivals: pd.DataFrame, icao_list: list, airports_info: dict) ->
     else:
         initial_view = pdk.ViewState(latitude=52, longitude=13, zoom=4, pitch=0)
 
-    deck = pdk.Deck(
+    return pdk.Deck(
         layers=[flight_layer, airport_layer],
         initial_view_state=initial_view,
         tooltip={"text": "{name}"}
     )
 
+def plot_map(df_arrivals: pd.DataFrame, icao_list: list, airports_info: dict) -> None:
+    """
+    Render a PyDeck map with arrival airport locations and flight points.
+
+    Args:
+        df_arrivals (pd.DataFrame): DataFrame containing arrival flights info.
+        icao_list (list): List of ICAO airport codes selected.
+        airports_info (dict): Dict with airport lat/lon/city info.
+    """
+    if df_arrivals.empty:
+        st.warning("No arrivals data to plot on map.")
+        return
+
+    # Only the [lon, lat] pairs of the flights are sent: pydeck serializes every
+    # DataFrame column of every row to JSON.
+    has_coords = df_arrivals['arrival_latitude'].notna().to_numpy() & df_arrivals['arrival_longitude'].notna().to_numpy()
+    flight_points = df_arrivals.loc[has_coords, ['arrival_longitude', 'arrival_latitude']]
+    # 5 decimals is ~1 m, far below screen precision, and keeps the JSON numbers short
+    positions = flight_points.to_numpy(dtype=np.float64).round(COORD_DECIMALS)
+    airport_points = _build_airport_points(tuple(icao_list), airports_info)
+    deck = _make_deck(positions.tobytes(), airport_points)
+
     st.subheader("🗺️ Flight Arrivals Map")
     st.pydeck_chart(deck)
 
-def plot_noise_subplots(df_noise: pd.DataFrame, icao_list: list) -> None:
+def plot_noise_subplots(df_noise: pd.DataFrame, icao_list: list, overlay: bool = False) -> None:
     """
     Plot noise measurements time series subplots, one subplot per selected airport ICAO.
 
     Args:
         df_noise (pd.DataFrame): Noise data with 'timestamp', 'noise_db', and 'icao' columns.
         icao_list (list): List of selected ICAO airport codes.
+        overlay (bool): Draw all airports on one shared axes instead of one subplot each.
     """
     if df_noise.empty:
         st.warning("No noise data to plot.")
@@ -87,24 +169,63 @@ def plot_noise_subplots(df_noise: pd.DataFrame, icao_list: list) -> None:
         return
 
     st.subheader("🔊 Noise Level Over Time by Airport")
+
+    # One pass over the frame instead of a boolean mask per airport
+    groups = dict(tuple(filtered.groupby('icao', sort=False, observed=True)))
+    # Per-minute means are plenty at screen resolution; raw sensor data can
+    # have orders of magnitude more points than the plot has pixels
+    series = {
+        icao: data.set_index('timestamp')['noise_db'].resample(NOISE_RESAMPLE_RULE).mean().dropna()
+        for icao, data in groups.items()
+    }
+
+    if overlay:
+        _plot_noise_overlay(series, icao_list)
+        return
+
     n_airports = len(icao_list)
-    fig, axes = plt.subplots(n_airports, 1, figsize=(12, 3 * n_airports), sharex=True)
+    fig, axes = _subplots(n_airports, 1, figsize=(12, 3 * n_airports), sharex=True)
     if n_airports == 1:
         axes = [axes]
 
     for ax, icao in zip(axes, icao_list):
-        data = filtered[filtered['icao'] == icao]
-        if data.empty:
+        per_minute = series.get(icao)
+        if per_minute is None:
             ax.text(0.5, 0.5, f"No data for {icao}", ha='center', va='center')
             continue
-        sns.lineplot(data=data, x='timestamp', y='noise_db', ax=ax)
+        ax.plot(_datetime_values(per_minute.index), per_minute.to_numpy(), linewidth=0.8)
         ax.set_title(f"Noise Levels at {icao}")
         ax.set_ylabel("Noise (dB)")
         ax.set_xlabel("")
         ax.grid(True)
 
-    plt.xlabel("Time")
-    st.pyplot(fig)
+    axes[-1].set_xlabel("Time")
+    _render(fig)
+
+def _plot_noise_overlay(series: dict, icao_list: list) -> None:
+    """
+    Draw every airport's per-minute noise series on one axes as a single LineCollection.
+
+    Args:
+        series (dict): Per-minute 'noise_db' Series by ICAO code.
+        icao_list (list): List of selected ICAO airport codes, in legend order.
+    """
+    codes = [icao for icao in icao_list if icao in series]
+    palette = sns.color_palette(n_colors=len(codes))
+    # One collection is one draw call, however many airports are selected
+    segments = [
+        np.column_stack([mdates.date2num(_datetime_values(series[icao].index)), series[icao].to_numpy(dtype=np.float64)])
+        for icao in codes
+    ]
+    fig, ax = _subplots(figsize=(12, 4))
+    ax.add_collection(LineCollection(segments, colors=palette, linewidths=0.8))
+    ax.autoscale()
+    ax.xaxis_date()
+    ax.legend(handles=[Line2D([], [], color=c, label=icao) for c, icao in zip(palette, codes)], loc='upper right')
+    ax.set_ylabel("Noise (dB)")
+    ax.set_xlabel("Time")
+    ax.grid(True)
+    _render(fig)
 
 def plot_arrival_histograms(df_arrivals: pd.DataFrame) -> None:
     """
@@ -119,14 +240,70 @@ def plot_arrival_histograms(df_arrivals: pd.DataFrame) -> None:
 
     st.subheader("✈️ Flight Arrivals by Hour of Day")
 
-    df_arrivals['hour'] = df_arrivals['arrival_scheduled_utc'].dt.hour
-    plt.figure(figsize=(10, 4))
-    sns.histplot(df_arrivals['hour'], bins=24, kde=False, color='navy')
-    plt.xlabel("Hour of Day (UTC)")
-    plt.ylabel("Number of Arrivals")
-    plt.xticks(range(0, 24))
-    plt.grid(True, axis='y')
-    st.pyplot(plt.gcf())
+    # Fixed 24 integer bins: count them directly, without touching df_arrivals
+    hours = df_arrivals['arrival_scheduled_utc'].dt.hour.dropna().to_numpy(dtype=np.intp)
+    counts = np.bincount(hours, minlength=24)
+    fig = _arrival_histogram_figure(tuple(counts.tolist()))
+    st.pyplot(fig, dpi=PLOT_DPI)
+    fig.clear()
+
+@st.cache_data(show_spinner=False)
+def _arrival_histogram_figure(counts: tuple) -> Figure:
+    """
+    Build the arrivals-per-hour bar chart for 24 hourly counts, cached across reruns.
+
+    A plain Figure is not registered with pyplot, and st.cache_data hands every
+    caller its own copy, so concurrent sessions never draw the same figure.
+    """
+    fig = Figure(figsize=(10, 4), dpi=PLOT_DPI, layout='constrained')
+    ax = fig.subplots()
+    ax.bar(np.arange(24), counts, width=1.0, color='navy')
+    ax.set_xlabel("Hour of Day (UTC)")
+    ax.set_ylabel("Number of Arrivals")
+    ax.set_xticks(range(0, 24))
+    ax.grid(True, axis='y')
+    return fig
+
+def _airport_keys(icao: pd.Series, icao_codes: tuple):
+    """
+    Encode icao as a Categorical of just the selected airports.
+
+    Returns a row mask for the selected airports and their icao as a categorical
+    Series, so filtering and grouping both work on integer codes.
+    """
+    codes = pd.Categorical(icao, categories=list(icao_codes))
+    keep = codes.codes >= 0
+    return keep, pd.Series(codes[keep], index=icao.index[keep], name='icao')
+
+@st.cache_data(show_spinner=False)
+def _compute_hourly(df_noise: pd.DataFrame, df_arrivals: pd.DataFrame, icao_codes: tuple) -> pd.DataFrame:
+    """
+    Hourly average noise and arrival counts per airport, cached across reruns.
+
+    Args:
+        df_noise (pd.DataFrame): Noise data with 'timestamp', 'noise_db', 'icao'.
+        df_arrivals (pd.DataFrame): Arrival data with 'arrival_scheduled_utc', 'icao'.
+        icao_codes (tuple): Selected airports.
+    """
+    # Only the needed columns are selected, and icao/hour are passed to groupby
+    # as keys instead of being added to a full copy of each frame
+
+    # Prepare noise hourly average
+    keep, icao = _airport_keys(df_noise['icao'], icao_codes)
+    noise = df_noise.loc[keep, ['timestamp', 'noise_db']]
+    hour = noise['timestamp'].dt.floor('h').rename('hour')
+    noise_avg = noise.groupby([icao, hour], sort=False, observed=True)['noise_db'].mean()
+
+    # Prepare arrivals hourly count
+    keep, icao = _airport_keys(df_arrivals['icao'], icao_codes)
+    arrivals = df_arrivals.loc[keep, ['arrival_scheduled_utc']]
+    hour = arrivals['arrival_scheduled_utc'].dt.floor('h').rename('hour')
+    arrivals_count = arrivals.groupby([icao, hour], sort=False, observed=True).size().rename('arrivals_count')
+
+    # Both results are indexed by (icao, hour): align them side by side on that
+    # index instead of hash-joining key columns, then sort once for plotting
+    merged = pd.concat([noise_avg, arrivals_count], axis=1).fillna(0)
+    return merged.sort_index().reset_index()
 
 def plot_combined_hourly(df_noise: pd.DataFrame, df_arrivals: pd.DataFrame, icao_list: list) -> None:
     """
@@ -143,34 +320,26 @@ def plot_combined_hourly(df_noise: pd.DataFrame, df_arrivals: pd.DataFrame, icao
 
     st.subheader("📊 Hourly Average Noise & Flight Arrivals")
 
-    # Prepare noise hourly average
-    noise = df_noise[df_noise['icao'].isin(icao_list)].copy()
-    noise['hour'] = noise['timestamp'].dt.floor('H')
-    noise_avg = noise.groupby(['icao', 'hour'])['noise_db'].mean().reset_index()
-
-    # Prepare arrivals hourly count
-    arrivals = df_arrivals[df_arrivals['icao'].isin(icao_list)].copy()
-    arrivals['hour'] = arrivals['arrival_scheduled_utc'].dt.floor('H')
-    arrivals_count = arrivals.groupby(['icao', 'hour']).size().reset_index(name='arrivals_count')
-
-    # Merge on icao and hour
-    merged = pd.merge(noise_avg, arrivals_count, on=['icao', 'hour'], how='outer').fillna(0)
+    merged = _compute_hourly(df_noise, df_arrivals, tuple(icao_list))
 
     # Plot per airport
     n_airports = len(icao_list)
-    fig, axes = plt.subplots(n_airports, 1, figsize=(14, 4 * n_airports), sharex=True)
+    fig, axes = _subplots(n_airports, 1, figsize=(14, 4 * n_airports), sharex=True)
 
     if n_airports == 1:
         axes = [axes]
 
+    merged_groups = dict(tuple(merged.groupby('icao', sort=False, observed=True)))
     for ax, icao in zip(axes, icao_list):
-        data = merged[merged['icao'] == icao].sort_values('hour')
-        if data.empty:
+        data = merged_groups.get(icao)
+        if data is None:
             ax.text(0.5, 0.5, f"No data for {icao}", ha='center', va='center')
             continue
         ax2 = ax.twinx()
-        ax.plot(data['hour'], data['noise_db'], 'b-', label='Avg Noise (dB)')
-        ax2.bar(data['hour'], data['arrivals_count'], alpha=0.3, color='orange', label='Arrivals Count')
+        hours = _datetime_values(data['hour'])
+        ax.plot(hours, data['noise_db'].to_numpy(), 'b-', label='Avg Noise (dB)')
+        # Bar widths on a date axis are in days
+        ax2.bar(hours, data['arrivals_count'].to_numpy(), width=1 / 24, align='edge', alpha=0.3, color='orange', label='Arrivals Count')
 
         ax.set_ylabel("Avg Noise (dB)", color='b')
         ax2.set_ylabel("Arrivals Count", color='orange')
@@ -179,9 +348,8 @@ def plot_combined_hourly(df_noise: pd.DataFrame, df_arrivals: pd.DataFrame, icao
         ax.legend(loc='upper left')
         ax2.legend(loc='upper right')
 
-    plt.xlabel("Time (Hourly)")
-    plt.tight_layout()
-    st.pyplot(fig)
+    axes[-1].set_xlabel("Time (Hourly)")
+    _render(fig)
 
 
 